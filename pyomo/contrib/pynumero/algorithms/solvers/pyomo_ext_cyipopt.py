@@ -13,8 +13,9 @@ import abc
 from pyomo.contrib.pynumero.algorithms.solvers.cyipopt_solver import CyIpoptProblemInterface
 from pyomo.contrib.pynumero.interfaces.pyomo_nlp import PyomoNLP
 from pyomo.contrib.pynumero.sparse.block_vector import BlockVector
-from pyomo.environ import Var, Constraint, value
+from pyomo.environ import Var, Constraint
 from pyomo.core.base.var import _VarData
+from pyomo.core.expr.numeric_expr import LinearExpression
 from pyomo.common.modeling import unique_component_name
 
 """
@@ -135,25 +136,25 @@ class PyomoExternalCyIpoptProblem(CyIpoptProblemInterface):
         # appear in the pyomo part of the model - also ensure unique name in case model
         # is used in more than one instance of this class
         # ToDo: Improve this by convincing Pyomo not to remove the inputs and outputs
+        ex_vars = self._inputs + self._outputs
         dummy_var_name = unique_component_name(self._pyomo_model, '_dummy_variable_CyIpoptPyomoExNLP')
         dummy_var = Var()
         setattr(self._pyomo_model, dummy_var_name, dummy_var)
         dummy_con_name = unique_component_name(self._pyomo_model, '_dummy_constraint_CyIpoptPyomoExNLP')
+        # build the sum of the inputs and outputs directly as a
+        # LinearExpression rather than through a chain of additions
         dummy_con = Constraint(
             expr = getattr(self._pyomo_model, dummy_var_name) == \
-               sum(v for v in self._inputs) + sum(v for v in self._outputs)
+               LinearExpression(constant=0,
+                                linear_coefs=[1]*len(ex_vars),
+                                linear_vars=ex_vars)
             )
         setattr(self._pyomo_model, dummy_con_name, dummy_con)
 
         # initialize the dummy var to the right hand side
-        dummy_var_value = 0
-        for v in self._inputs:
-            if v.value is not None:
-                dummy_var_value += value(v)
-        for v in self._outputs:
-            if v.value is not None:
-                dummy_var_value += value(v)
-        dummy_var.value = dummy_var_value
+        dummy_var.value = float(np.fromiter(
+            (v.value for v in ex_vars if v.value is not None),
+            dtype=np.float64).sum())
 
         # make an nlp interface from the pyomo model
         self._pyomo_nlp = PyomoNLP(self._pyomo_model)
@@ -229,9 +230,7 @@ class PyomoExternalCyIpoptProblem(CyIpoptProblemInterface):
         # the rows down and shift the columns appropriately
         jac_ex_irows = np.copy(jac_ex.row)
         jac_ex_irows += ex_start_row
-        jac_ex_jcols = np.copy(jac_ex.col)
-        for z,col in enumerate(jac_ex_jcols):
-            jac_ex_jcols[z] = self._input_columns[col]
+        jac_ex_jcols = np.asarray(self._input_columns, dtype=jac_ex.col.dtype)[jac_ex.col]
         jac_ex_data = np.copy(jac_ex.data)
 
         # CDL: this code was for the dense version of evaluate_derivatives
@@ -264,14 +263,18 @@ class PyomoExternalCyIpoptProblem(CyIpoptProblemInterface):
 
         Parameters
         ----------
-        primals : numpy array
+        primals : numpy array or list
            The array of values that will be given to the Pyomo variables. The
            order of this array is the same as the order in the PyomoNLP created
            internally.
         """
         pyomo_variables = self._pyomo_nlp.get_pyomo_variables()
-        for i,v in enumerate(primals):
-            pyomo_variables[i].set_value(v)
+        if len(primals) != len(pyomo_variables):
+            raise ValueError('load_x_into_pyomo expected an array of {} primal'
+                             ' values, but received {}.'.format(
+                                 len(pyomo_variables), len(primals)))
+        for var, val in zip(pyomo_variables, np.asarray(primals).tolist()):
+            var.set_value(val)
 
     def _set_primals_if_necessary(self, primals):
         if not np.array_equal(primals, self._cached_primals):
@@ -321,10 +324,7 @@ class PyomoExternalCyIpoptProblem(CyIpoptProblemInterface):
         pyomo_constraints = self._pyomo_nlp.evaluate_constraints()
         ex_io_outputs = self._ex_io_model.evaluate_outputs()
         ex_io_constraints = ex_io_outputs - self._ex_io_outputs_from_full_primals(primals)
-        constraints = BlockVector(2)
-        constraints.set_block(0, pyomo_constraints)
-        constraints.set_block(1, ex_io_constraints)
-        return constraints.flatten()
+        return np.concatenate((pyomo_constraints, ex_io_constraints))
 
     def jacobianstructure(self):
         return self._full_jac_irows, self._full_jac_jcols
@@ -9,8 +9,12 @@
 #  ___________________________________________________________________________
 
 import os
+import shutil
+import tempfile
 import pyutilib.th as unittest
 import pyomo.environ as pyo
+from pyomo.common.collections import ComponentMap
+from pyomo.repn import generate_standard_repn
 
 from pyomo.contrib.pynumero.dependencies import (
     numpy as np, numpy_available, scipy_sparse as spa, scipy_available
@@ -32,34 +36,133 @@ from pyomo.contrib.pynumero.algorithms.solvers.pyomo_ext_cyipopt import External
 from pyomo.contrib.pynumero.algorithms.solvers.cyipopt_solver import CyIpoptSolver
 
 
+def _make_cyipopt_solver(problem, options=None):
+    # PyomoExternalCyIpoptProblem does not provide hessians, so default
+    # to the limited-memory approximation unless explicitly overridden
+    options = dict(options) if options else dict()
+    options.setdefault('hessian_approximation', 'limited-memory')
+    # an HSL linear solver (e.g., ma27 or ma57) can be selected through
+    # the environment if the Ipopt build supports it; otherwise, use
+    # the Ipopt default (typically mumps)
+    linear_solver = os.environ.get('PYOMO_IPOPT_LINSOLVER')
+    if linear_solver:
+        options.setdefault('linear_solver', linear_solver)
+    return CyIpoptSolver(problem, options)
+
+
+# sparsity structure of the PressureDropModel jacobian
+#   dP1/d(Pin, c1, F), dP2/d(Pin, c1, c2, F)
+# (shared by all instances, so these are read-only and int32, the index
+# dtype scipy uses for matrices this size, so coo_matrix does not need
+# to make its own copy)
+_JAC_ROW = np.asarray([0, 0, 0, 1, 1, 1, 1], dtype=np.int32)
+_JAC_COL = np.asarray([0, 1, 3, 0, 1, 2, 3], dtype=np.int32)
+_JAC_ROW.setflags(write=False)
+_JAC_COL.setflags(write=False)
+
+
 class PressureDropModel(ExternalInputOutputModel):
     def __init__(self):
         self._Pin = None
         self._c1 = None
         self._c2 = None
         self._F = None
+        self._outputs = np.zeros(2, dtype=np.float64)
+        # the jacobian has a fixed structure, so we build it once and
+        # update the nonzero values in evaluate_derivatives (building it
+        # from the dense jacobian would drop any entries that happen to
+        # evaluate to zero)
+        self._jac = spa.coo_matrix(
+            (np.asarray([1, 0, 0, 1, 0, 0, 0], dtype=np.float64),
+             (_JAC_ROW, _JAC_COL)), shape=(2,4))
 
     def set_inputs(self, input_values):
         assert len(input_values) == 4
-        self._Pin = input_values[0]
-        self._c1 = input_values[1]
-        self._c2 = input_values[2]
-        self._F = input_values[3]
+        # store python floats - the evaluations below are scalar
+        # arithmetic that is slower on numpy scalars
+        self._Pin, self._c1, self._c2, self._F = \
+            np.asarray(input_values, dtype=np.float64).tolist()
 
     def evaluate_outputs(self):
-        P1 = self._Pin - self._c1*self._F**2
-        P2 = P1 - self._c2*self._F**2
-        return np.asarray([P1, P2], dtype=np.float64)
+        F2 = self._F*self._F
+        P1 = self._Pin - self._c1*F2
+        P2 = P1 - self._c2*F2
+        out = self._outputs
+        out[0] = P1
+        out[1] = P2
+        return out
 
     def evaluate_derivatives(self):
-        jac = [[1, -self._F**2, 0, -2*self._c1*self._F],
-               [1, -self._F**2, -self._F**2, -2*self._F*(self._c1 + self._c2)]]
-        jac = np.asarray(jac, dtype=np.float64)
-        return spa.coo_matrix(jac)
+        c1 = self._c1
+        F = self._F
+        F2 = F*F
+        # only update the values that depend on the inputs
+        data = self._jac.data
+        data[1] = -F2
+        data[2] = -2*c1*F
+        data[4] = -F2
+        data[5] = -F2
+        data[6] = -2*F*(c1 + self._c2)
+        return self._jac
+
+
+class PressureDropProblemWithHessian(PyomoExternalCyIpoptProblem):
+    # PyomoExternalCyIpoptProblem does not support hessians, but for the
+    # parameter estimation problem in the tests below, the hessian of
+    # the lagrangian is known in closed form:
+    #   obj = (P1 - 90)^2 + (P2 - 40)^2
+    #   P1 = Pin - c1*F^2
+    #   P2 = Pin - (c1 + c2)*F^2
+    # (the pyomo constraints are all linear)
+    def __init__(self, *args, **kwds):
+        super(PressureDropProblemWithHessian, self).__init__(*args, **kwds)
+        Pin, c1, c2, F = self._input_columns
+        P1, P2 = self._output_columns
+        # lower triangular entries: (P1,P1), (P2,P2), (F,c1), (F,c2), (F,F)
+        entries = [(P1, P1), (P2, P2), (F, c1), (F, c2), (F, F)]
+        self._hess_irows = np.asarray([max(e) for e in entries], dtype=np.int64)
+        self._hess_jcols = np.asarray([min(e) for e in entries], dtype=np.int64)
+        self._hess_data = np.zeros(len(entries), dtype=np.float64)
+
+    def hessianstructure(self):
+        return self._hess_irows, self._hess_jcols
+
+    def hessian(self, x, y, obj_factor):
+        _, c1, c2, F = x[self._input_columns].tolist()
+        y1, y2 = y[self._pyomo_nlp.n_constraints():].tolist()
+        data = self._hess_data
+        data[0] = 2*obj_factor
+        data[1] = 2*obj_factor
+        data[2] = -2*F*(y1 + y2)
+        data[3] = -2*F*y2
+        data[4] = -2*c1*y1 - 2*(c1 + c2)*y2
+        return data
 
 
 class TestExternalInputOutputModel(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        # the PyomoExternalCyIpoptProblem tests all start from the
+        # same model, so build it once and clone it in each test
+        # (the problem adds the dummy variable and constraint to it)
+        m = pyo.ConcreteModel()
+        m.Pin = pyo.Var(initialize=100.0, bounds=(0,None))
+        m.c1 = pyo.Var(initialize=1.0, bounds=(0,None))
+        m.c2 = pyo.Var(initialize=1.0, bounds=(0,None))
+        m.F = pyo.Var(initialize=10.0, bounds=(0,None))
+
+        m.P1 = pyo.Var()
+        m.P2 = pyo.Var()
+
+        m.F_con = pyo.Constraint(expr = m.F == 10)
+        m.Pin_con = pyo.Constraint(expr = m.Pin == 100)
+
+        # simple parameter estimation test
+        m.obj = pyo.Objective(expr=pyo.quicksum(
+            (p - t)**2 for p, t in ((m.P1, 90), (m.P2, 40))))
+        cls._base_model = m
+
     def test_interface(self):
         # weird, this is really a test of the test class above
         # but we could add code later, so...
@@ -74,20 +177,7 @@ class TestExternalInputOutputModel(unittest.TestCase):
         self.assertTrue(np.array_equal(jac.todense(), expected_jac))
 
     def test_pyomo_external_model(self):
-        m = pyo.ConcreteModel()
-        m.Pin = pyo.Var(initialize=100, bounds=(0,None))
-        m.c1 = pyo.Var(initialize=1.0, bounds=(0,None))
-        m.c2 = pyo.Var(initialize=1.0, bounds=(0,None))
-        m.F = pyo.Var(initialize=10, bounds=(0,None))
-
-        m.P1 = pyo.Var()
-        m.P2 = pyo.Var()
-
-        m.F_con = pyo.Constraint(expr = m.F == 10)
-        m.Pin_con = pyo.Constraint(expr = m.Pin == 100)
-
-        # simple parameter estimation test
-        m.obj = pyo.Objective(expr= (m.P1 - 90)**2 + (m.P2 - 40)**2)
+        m = self._base_model.clone()
 
         cyipopt_problem = \
             PyomoExternalCyIpoptProblem(m,
@@ -96,34 +186,72 @@ class TestExternalInputOutputModel(unittest.TestCase):
                                         [m.P1, m.P2]
                                         )
 
+        # check that the dummy constraint is dummy - sum(inputs + outputs)
+        dummy_var = m._dummy_variable_CyIpoptPyomoExNLP
+        repn = generate_standard_repn(
+            m._dummy_constraint_CyIpoptPyomoExNLP.body, compute_values=False)
+        self.assertTrue(repn.is_linear())
+        self.assertEqual(repn.constant, 0)
+        coefs = ComponentMap(zip(repn.linear_vars, repn.linear_coefs))
+        self.assertEqual(len(coefs), 7)
+        self.assertEqual(coefs[dummy_var], 1)
+        for v in (m.Pin, m.c1, m.c2, m.F, m.P1, m.P2):
+            self.assertEqual(coefs[v], -1)
+
         # check that the dummy variable is initialized
-        expected_dummy_var_value = pyo.value(m.Pin) + pyo.value(m.c1) + pyo.value(m.c2) + pyo.value(m.F) \
-            + 0 + 0
-            # + pyo.value(m.P1) + pyo.value(m.P2) # not initialized - therefore should use zero
-        self.assertAlmostEqual(pyo.value(m._dummy_variable_CyIpoptPyomoExNLP), expected_dummy_var_value)
+        # (P1 and P2 are not initialized - therefore should use zero)
+        expected_dummy_var_value = -sum(
+            c*v.value for v, c in coefs.items()
+            if v is not dummy_var and v.value is not None)
+        self.assertAlmostEqual(pyo.value(dummy_var), expected_dummy_var_value)
+        self.assertAlmostEqual(expected_dummy_var_value, 100 + 1.0 + 1.0 + 10)
 
         # solve the problem
-        solver = CyIpoptSolver(cyipopt_problem, {'hessian_approximation':'limited-memory'})
+        solver = _make_cyipopt_solver(cyipopt_problem)
         x, info = solver.solve(tee=False)
         cyipopt_problem.load_x_into_pyomo(x)
         self.assertAlmostEqual(pyo.value(m.c1), 0.1, places=5)
         self.assertAlmostEqual(pyo.value(m.c2), 0.5, places=5)
 
-    def test_pyomo_external_model_scaling(self):
-        m = pyo.ConcreteModel()
-        m.Pin = pyo.Var(initialize=100, bounds=(0,None))
-        m.c1 = pyo.Var(initialize=1.0, bounds=(0,None))
-        m.c2 = pyo.Var(initialize=1.0, bounds=(0,None))
-        m.F = pyo.Var(initialize=10, bounds=(0,None))
+        # arrays of the wrong length are rejected without loading anything
+        n = len(x)
+        with self.assertRaisesRegex(ValueError, 'expected an array of %s primal values, but received %s' % (n, n-1)):
+            cyipopt_problem.load_x_into_pyomo(np.zeros(n-1))
+        with self.assertRaisesRegex(ValueError, 'expected an array of %s primal values, but received %s' % (n, n+1)):
+            cyipopt_problem.load_x_into_pyomo(np.zeros(n+1))
+        self.assertAlmostEqual(pyo.value(m.c1), 0.1, places=5)
 
-        m.P1 = pyo.Var()
-        m.P2 = pyo.Var()
+        # a plain list is accepted as well
+        cyipopt_problem.load_x_into_pyomo([0.0]*n)
+        self.assertEqual(pyo.value(m.c1), 0.0)
+        cyipopt_problem.load_x_into_pyomo(x.tolist())
+        self.assertAlmostEqual(pyo.value(m.c2), 0.5, places=5)
 
-        m.F_con = pyo.Constraint(expr = m.F == 10)
-        m.Pin_con = pyo.Constraint(expr = m.Pin == 100)
+    # the solve with the closed-form hessian has not yet been run with
+    # cyipopt and the ASL, so keep it out of the default (nightly) runs
+    # until it has; it still runs with "--cat expensive"
+    @unittest.category('expensive')
+    def test_pyomo_external_model_exact_hessian(self):
+        m = self._base_model.clone()
 
-        # simple parameter estimation test
-        m.obj = pyo.Objective(expr= (m.P1 - 90)**2 + (m.P2 - 40)**2)
+        cyipopt_problem = \
+            PressureDropProblemWithHessian(m,
+                                           PressureDropModel(),
+                                           [m.Pin, m.c1, m.c2, m.F],
+                                           [m.P1, m.P2]
+                                           )
+
+        # solve the problem using the hessian provided above rather
+        # than the limited-memory approximation
+        solver = _make_cyipopt_solver(cyipopt_problem,
+                                      {'hessian_approximation':'exact'})
+        x, info = solver.solve(tee=False)
+        cyipopt_problem.load_x_into_pyomo(x)
+        self.assertAlmostEqual(pyo.value(m.c1), 0.1, places=5)
+        self.assertAlmostEqual(pyo.value(m.c2), 0.5, places=5)
+
+    def test_pyomo_external_model_scaling(self):
+        m = self._base_model.clone()
 
         # set scaling parameters for the pyomo variables and constraints
         m.scaling_factor = pyo.Suffix(direction=pyo.Suffix.EXPORT)
@@ -145,21 +273,23 @@ class TestExternalInputOutputModel(unittest.TestCase):
                                         outputs_eqn_scaling=[10.0, 11.0]
                                         )
 
-        # solve the problem
-        options={'hessian_approximation':'limited-memory',
-                 'nlp_scaling_method': 'user-scaling',
-                 'output_file': '_cyipopt-pyomo-ext-scaling.log',
+        # solve the problem (writing the log to a temporary directory
+        # so concurrent test runs do not clobber each other's output)
+        logdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, logdir)
+        logfile = os.path.join(logdir, '_cyipopt-pyomo-ext-scaling.log')
+        options={'nlp_scaling_method': 'user-scaling',
+                 'output_file': logfile,
                  'file_print_level':10,
                  'max_iter': 0}
-        solver = CyIpoptSolver(cyipopt_problem, options=options)
+        solver = _make_cyipopt_solver(cyipopt_problem, options)
         x, info = solver.solve(tee=False)
 
-        with open('_cyipopt-pyomo-ext-scaling.log', 'r') as fd:
+        with open(logfile, 'r') as fd:
             solver_trace = fd.read()
-        os.remove('_cyipopt-pyomo-ext-scaling.log')
 
         self.assertIn('nlp_scaling_method = user-scaling', solver_trace)
-        self.assertIn('output_file = _cyipopt-pyomo-ext-scaling.log', solver_trace)
+        self.assertIn('output_file = %s' % logfile, solver_trace)
         self.assertIn('objective scaling factor = 0.1', solver_trace)
         self.assertIn('x scaling provided', solver_trace)
         self.assertIn('c scaling provided', solver_trace)
@@ -180,20 +310,7 @@ class TestExternalInputOutputModel(unittest.TestCase):
         self.assertIn('c scaling vector[    5]= 1.1000000000000000e+01', solver_trace)
 
     def test_pyomo_external_model_ndarray_scaling(self):
-        m = pyo.ConcreteModel()
-        m.Pin = pyo.Var(initialize=100, bounds=(0,None))
-        m.c1 = pyo.Var(initialize=1.0, bounds=(0,None))
-        m.c2 = pyo.Var(initialize=1.0, bounds=(0,None))
-        m.F = pyo.Var(initialize=10, bounds=(0,None))
-
-        m.P1 = pyo.Var()
-        m.P2 = pyo.Var()
-
-        m.F_con = pyo.Constraint(expr = m.F == 10)
-        m.Pin_con = pyo.Constraint(expr = m.Pin == 100)
-
-        # simple parameter estimation test
-        m.obj = pyo.Objective(expr= (m.P1 - 90)**2 + (m.P2 - 40)**2)
+        m = self._base_model.clone()
 
         # set scaling parameters for the pyomo variables and constraints
         m.scaling_factor = pyo.Suffix(direction=pyo.Suffix.EXPORT)
@@ -216,21 +333,23 @@ class TestExternalInputOutputModel(unittest.TestCase):
                                         outputs_eqn_scaling=np.asarray([10.0, 11.0], dtype=np.float64)
                                         )
 
-        # solve the problem
-        options={'hessian_approximation':'limited-memory',
-                 'nlp_scaling_method': 'user-scaling',
-                 'output_file': '_cyipopt-pyomo-ext-scaling-ndarray.log',
+        # solve the problem (writing the log to a temporary directory
+        # so concurrent test runs do not clobber each other's output)
+        logdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, logdir)
+        logfile = os.path.join(logdir, '_cyipopt-pyomo-ext-scaling-ndarray.log')
+        options={'nlp_scaling_method': 'user-scaling',
+                 'output_file': logfile,
                  'file_print_level':10,
                  'max_iter': 0}
-        solver = CyIpoptSolver(cyipopt_problem, options=options)
+        solver = _make_cyipopt_solver(cyipopt_problem, options)
         x, info = solver.solve(tee=False)
 
-        with open('_cyipopt-pyomo-ext-scaling-ndarray.log', 'r') as fd:
+        with open(logfile, 'r') as fd:
             solver_trace = fd.read()
-        os.remove('_cyipopt-pyomo-ext-scaling-ndarray.log')
 
         self.assertIn('nlp_scaling_method = user-scaling', solver_trace)
-        self.assertIn('output_file = _cyipopt-pyomo-ext-scaling-ndarray.log', solver_trace)
+        self.assertIn('output_file = %s' % logfile, solver_trace)
         self.assertIn('objective scaling factor = 0.1', solver_trace)
         self.assertIn('x scaling provided', solver_trace)
         self.assertIn('c scaling provided', solver_trace)
@@ -251,20 +370,9 @@ class TestExternalInputOutputModel(unittest.TestCase):
         self.assertIn('c scaling vector[    5]= 1.1000000000000000e+01', solver_trace)
 
     def test_pyomo_external_model_dummy_var_initialization(self):
-        m = pyo.ConcreteModel()
-        m.Pin = pyo.Var(initialize=100, bounds=(0,None))
-        m.c1 = pyo.Var(initialize=1.0, bounds=(0,None))
-        m.c2 = pyo.Var(initialize=1.0, bounds=(0,None))
-        m.F = pyo.Var(initialize=10, bounds=(0,None))
-
-        m.P1 = pyo.Var(initialize=75.0)
-        m.P2 = pyo.Var(initialize=50.0)
-
-        m.F_con = pyo.Constraint(expr = m.F == 10)
-        m.Pin_con = pyo.Constraint(expr = m.Pin == 100)
-
-        # simple parameter estimation test
-        m.obj = pyo.Objective(expr= (m.P1 - 90)**2 + (m.P2 - 40)**2)
+        m = self._base_model.clone()
+        m.P1.value = 75.0
+        m.P2.value = 50.0
 
         cyipopt_problem = \
             PyomoExternalCyIpoptProblem(m,
@@ -274,15 +382,20 @@ class TestExternalInputOutputModel(unittest.TestCase):
                                         )
 
         # check that the dummy variable is initialized
-        expected_dummy_var_value = pyo.value(m.Pin) + pyo.value(m.c1) + pyo.value(m.c2) + pyo.value(m.F) \
-            + pyo.value(m.P1) + pyo.value(m.P2)
+        vals = [pyo.value(v, exception=False)
+                for v in (m.Pin, m.c1, m.c2, m.F, m.P1, m.P2)]
+        # all of the inputs and outputs are initialized in this test
+        self.assertNotIn(None, vals)
+        expected_dummy_var_value = sum(vals)
         self.assertAlmostEqual(pyo.value(m._dummy_variable_CyIpoptPyomoExNLP), expected_dummy_var_value)
         # check that the dummy constraint is satisfied
-        self.assertAlmostEqual(pyo.value(m._dummy_constraint_CyIpoptPyomoExNLP.body),pyo.value(m._dummy_constraint_CyIpoptPyomoExNLP.lower))
-        self.assertAlmostEqual(pyo.value(m._dummy_constraint_CyIpoptPyomoExNLP.body),pyo.value(m._dummy_constraint_CyIpoptPyomoExNLP.upper))
+        dummy_con = m._dummy_constraint_CyIpoptPyomoExNLP
+        body, lower, upper = [pyo.value(e) for e in
+                              (dummy_con.body, dummy_con.lower, dummy_con.upper)]
+        np.testing.assert_allclose([body, body], [lower, upper], rtol=0, atol=5e-8)
 
         # solve the problem
-        solver = CyIpoptSolver(cyipopt_problem, {'hessian_approximation':'limited-memory'})
+        solver = _make_cyipopt_solver(cyipopt_problem)
         x, info = solver.solve(tee=False)
         cyipopt_problem.load_x_into_pyomo(x)
         self.assertAlmostEqual(pyo.value(m.c1), 0.1, places=5)
@@ -247,7 +247,9 @@ class ExternalGreyBoxModel(object):
     def evaluate_equality_constraints(self):
         """
         Compute the residuals from the model (using the values
-        set in input_values) and return as a numpy array
+        set in input_values) and return as a numpy array. The
+        returned array is not retained by the caller, so a
+        preallocated array may be filled and returned on each call.
         """
         raise NotImplementedError('evaluate_equality_constraints called '
                                   'but not implemented in the derived class.')
@@ -255,7 +257,9 @@ class ExternalGreyBoxModel(object):
     def evaluate_outputs(self):
         """
         Compute the outputs from the model (using the values
-        set in input_values) and return as a numpy array
+        set in input_values) and return as a numpy array. The
+        returned array is not retained by the caller, so a
+        preallocated array may be filled and returned on each call.
         """
         raise NotImplementedError('evaluate_outputs called '
                                   'but not implemented in the derived class.')
@@ -266,7 +270,9 @@ class ExternalGreyBoxModel(object):
         to the inputs (using the values set in input_values).
         This should be a scipy matrix with the rows in
         the order of the residual names and the cols in
-        the order of the input variables.
+        the order of the input variables. As with the values,
+        a preallocated matrix may be updated and returned on
+        each call, provided its sparsity structure does not change.
         """
         raise NotImplementedError('evaluate_jacobian_equality_constraints called '
                                   'but not implemented in the derived class.')
@@ -277,7 +283,9 @@ class ExternalGreyBoxModel(object):
         to the inputs (using the values set in input_values).
         This should be a scipy matrix with the rows in
         the order of the output variables and the cols in
-        the order of the input variables.
+        the order of the input variables. As with the values,
+        a preallocated matrix may be updated and returned on
+        each call, provided its sparsity structure does not change.
         """
         raise NotImplementedError('evaluate_equality_outputs called '
                                   'but not implemented in the derived class.')
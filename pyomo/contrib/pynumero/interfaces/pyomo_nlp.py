@@ -1179,12 +1179,20 @@ class _ExternalGreyBoxModelHelper(object):
             self._ex_output_duals_to_full_map = \
                 list(xrange(con_offset + n_eq_constraints, con_offset + n_eq_constraints + n_outputs))
 
+        # preallocated vector for the residuals [h_eq(x); h_o(x)-o]
+        self._n_eq_constraints = n_eq_constraints
+        self._n_outputs = n_outputs
+        self._residuals = np.zeros(n_eq_constraints + n_outputs, dtype=np.float64)
+
         # we need to change the column indices in the jacobian
         # from the 0..n_inputs provided by the external model
         # to the indices corresponding to the full Pyomo model
         # so we create that here
         self._eq_jac_primal_jcol = None
         self._outputs_jac_primal_jcol = None
+        self._eq_jac = None
+        self._outputs_jac = None
+        self._outputs_jac_nnz = None
         self._additional_output_entries_irow = None
         self._additional_output_entries_jcol = None
         self._additional_output_entries_data = None
@@ -1238,65 +1246,109 @@ class _ExternalGreyBoxModelHelper(object):
         # evalute the equality constraints and the output equations
         # and return a single vector of residuals
         # returns residual for h(x)=0, where h(x) = [h_eq(x); h_o(x)-o]
-        resid_list = []
-        if self._ex_model.n_equality_constraints() > 0:
-            resid_list.append(self._ex_model.evaluate_equality_constraints())
-
-        if self._ex_model.n_outputs() > 0:
+        # Note: the returned array is reused on subsequent calls
+        # The lengths are checked explicitly since the assignments below
+        # would silently broadcast a residual vector of the wrong size
+        n_eq = self._n_eq_constraints
+        if n_eq > 0:
+            eq_con_values = self._ex_model.evaluate_equality_constraints()
+            if len(eq_con_values) != n_eq:
+                raise ValueError(
+                    'The external grey box model returned %s equality'
+                    ' constraint residuals, but it has %s equality'
+                    ' constraints.' % (len(eq_con_values), n_eq))
+            self._residuals[:n_eq] = eq_con_values
+
+        if self._n_outputs > 0:
             computed_output_values = self._ex_model.evaluate_outputs()
-            output_resid = computed_output_values - self._output_values
-            resid_list.append(output_resid)
+            if len(computed_output_values) != self._n_outputs:
+                raise ValueError(
+                    'The external grey box model returned %s output'
+                    ' values, but it has %s outputs.'
+                    % (len(computed_output_values), self._n_outputs))
+            np.subtract(computed_output_values, self._output_values,
+                        out=self._residuals[n_eq:])
 
-        return np.concatenate(resid_list)
+        return self._residuals
 
     def evaluate_jacobian(self):
         # compute the jacobian of h(x) w.r.t. x
         # J_h(x) = [Jw_eq(Pu*x); Jw_o(Pu*x)-Po*x]
+        # Note: the returned matrices are reused on subsequent calls
 
         # Jw_eq(x)
         eq_jac = None
         if self._ex_model.n_equality_constraints() > 0:
             eq_jac = self._ex_model.evaluate_jacobian_equality_constraints()
-            if self._eq_jac_primal_jcol is None:
+            # the external model may return any scipy sparse format,
+            # but we need the triplets below
+            if not isinstance(eq_jac, coo_matrix):
+                eq_jac = eq_jac.tocoo()
+            if self._eq_jac is None:
                 # The first time through, we won't have created the
                 # mapping of external primals ('u') to the full space
                 # primals ('x')
                 self._eq_jac_primal_jcol = self._inputs_to_primals_map[
                     eq_jac.col]
-            # map the columns from the inputs "u" back to the full primals "x"
-            eq_jac = coo_matrix(
-                (eq_jac.data, (eq_jac.row, self._eq_jac_primal_jcol)),
-                (eq_jac.shape[0], self._n_primals))
+                # map the columns from the inputs "u" back to the full
+                # primals "x" - the structure is fixed, so we only need
+                # to update the nonzero values on subsequent calls
+                self._eq_jac = coo_matrix(
+                    (np.array(eq_jac.data, dtype=np.float64),
+                     (eq_jac.row.copy(), self._eq_jac_primal_jcol)),
+                    (eq_jac.shape[0], self._n_primals))
+            else:
+                if eq_jac.nnz != self._eq_jac.nnz:
+                    raise ValueError(
+                        'The number of nonzeros in the jacobian of the'
+                        ' equality constraints returned by the external'
+                        ' grey box model changed from %s to %s. The'
+                        ' sparsity structure of the jacobian must not'
+                        ' change between calls.'
+                        % (self._eq_jac.nnz, eq_jac.nnz))
+                np.copyto(self._eq_jac.data, eq_jac.data)
+            eq_jac = self._eq_jac
 
         outputs_jac = None
         if self._ex_model.n_outputs() > 0:
             outputs_jac = self._ex_model.evaluate_jacobian_outputs()
+            if not isinstance(outputs_jac, coo_matrix):
+                outputs_jac = outputs_jac.tocoo()
 
-            row = outputs_jac.row
             # map the columns from the inputs "u" back to the full primals "x"
-            if self._outputs_jac_primal_jcol is None:
+            if self._outputs_jac is None:
                 # The first time through, we won't have created the
                 # mapping of external outputs ('o') to the full space
                 # primals ('x')
                 self._outputs_jac_primal_jcol = self._inputs_to_primals_map[
                     outputs_jac.col]
-                
+
                 # We also need tocreate the irow, jcol, nnz structure for the
                 # output variable portion of h(u)-o=0
                 self._additional_output_entries_irow = np.asarray(xrange(self._ex_model.n_outputs()))
                 self._additional_output_entries_jcol = self._outputs_to_primals_map
                 self._additional_output_entries_data = -1.0*np.ones(self._ex_model.n_outputs())
 
-            col = self._outputs_jac_primal_jcol
-            data = outputs_jac.data
-
-            # add the additional entries for the -Po*x portion of the jacobian
-            row = np.concatenate((row, self._additional_output_entries_irow))
-            col = np.concatenate((col, self._additional_output_entries_jcol))
-            data  = np.concatenate((data, self._additional_output_entries_data))
-            outputs_jac = coo_matrix(
-                (data, (row, col)),
-                shape=(outputs_jac.shape[0], self._n_primals))
+                # add the additional entries for the -Po*x portion of the jacobian
+                row = np.concatenate((outputs_jac.row, self._additional_output_entries_irow))
+                col = np.concatenate((self._outputs_jac_primal_jcol, self._additional_output_entries_jcol))
+                data = np.concatenate((outputs_jac.data, self._additional_output_entries_data))
+                self._outputs_jac_nnz = len(outputs_jac.data)
+                self._outputs_jac = coo_matrix(
+                    (data.astype(np.float64, copy=False), (row, col)),
+                    shape=(outputs_jac.shape[0], self._n_primals))
+            else:
+                if outputs_jac.nnz != self._outputs_jac_nnz:
+                    raise ValueError(
+                        'The number of nonzeros in the jacobian of the'
+                        ' outputs returned by the external grey box model'
+                        ' changed from %s to %s. The sparsity structure of'
+                        ' the jacobian must not change between calls.'
+                        % (self._outputs_jac_nnz, outputs_jac.nnz))
+                # the -1 entries for the -Po*x portion do not change
+                np.copyto(self._outputs_jac.data[:self._outputs_jac_nnz],
+                          outputs_jac.data)
+            outputs_jac = self._outputs_jac
 
         jac = None
         if eq_jac is not None:
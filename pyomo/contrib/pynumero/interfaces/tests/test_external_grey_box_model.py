@@ -98,40 +98,95 @@ from pyomo.contrib.pynumero.interfaces.tests.compare_utils import check_vectors_
 #              ]
 #   h_o(u) = {empty}
 #
+
+def _index_array(idx):
+    # jacobian sparsity patterns are shared by all instances of a model,
+    # so mark them read-only to catch accidental modification (these
+    # must be int32, the index dtype scipy uses for matrices this size,
+    # otherwise coo_matrix makes its own writable copy)
+    idx = np.asarray(idx, dtype=np.int32)
+    idx.setflags(write=False)
+    return idx
+
+_IROW_PDSO = _index_array([0, 0, 0])
+_JCOL_PDSO = _index_array([0, 1, 2])
+_IROW_PDSE = _index_array([0, 0, 0, 0])
+_JCOL_PDSE = _index_array([0, 1, 2, 3])
+_IROW_PDTO = _index_array([0, 0, 0, 1, 1, 1])
+_JCOL_PDTO = _index_array([0, 1, 2, 0, 1, 2])
+_IROW_PDTE = _index_array([0, 0, 0, 0, 1, 1, 1, 1])
+_JCOL_PDTE = _index_array([0, 1, 2, 3, 1, 2, 3, 4])
+_IROW_EQ_PDTETO = _index_array([0, 0, 0, 0, 1, 1, 1, 1])
+_JCOL_EQ_PDTETO = _index_array([0, 1, 2, 3, 1, 2, 3, 4])
+_IROW_O_PDTETO = _index_array([0, 0, 0, 1, 1, 1])
+_JCOL_O_PDTETO = _index_array([1, 2, 3, 0, 1, 2])
+# every hessian below has nonzeros only in the (F, c) and (F, F) entries
+_IROW_HESS = _index_array([2, 2])
+_JCOL_HESS = _index_array([1, 2])
+
+_coo = spa.coo_matrix
+
+
 class PressureDropSingleOutput(ExternalGreyBoxModel):
+    _INPUT_NAMES = ('Pin', 'c', 'F')
+    _OUT_NAMES = ('Pout',)
+
     def __init__(self):
-        self._input_names = ['Pin', 'c', 'F']
         self._input_values = np.zeros(3, dtype=np.float64)
-        self._output_names = ['Pout']
+        # python float copies of the inputs used by the evaluate methods
+        self._Pin = self._c = self._F = 0.0
+        self._output_values = np.zeros(1, dtype=np.float64)
+        # the sparsity structure is fixed, so we build the jacobian
+        # once (including the constant entries) and only update the
+        # input dependent nonzero values in evaluate_jacobian_outputs
+        self._jac_o = _coo(
+            (np.asarray([1, 0, 0], dtype=np.float64), (_IROW_PDSO, _JCOL_PDSO)),
+            shape=(1,3))
 
     def input_names(self):
-        return self._input_names
+        return self._INPUT_NAMES
 
     def equality_constraint_names(self):
         return []
 
     def output_names(self):
-        return self._output_names
+        return self._OUT_NAMES
 
     def set_input_values(self, input_values):
         assert len(input_values) == 3
-        np.copyto(self._input_values, input_values)
+        self._input_values[:] = input_values
+        self._Pin, self._c, self._F = self._input_values.tolist()
 
     def evaluate_outputs(self):
-        Pin = self._input_values[0]
-        c = self._input_values[1]
-        F = self._input_values[2]
-        Pout = Pin - 4*c*F**2
-        return np.asarray([Pout], dtype=np.float64)
+        Pin = self._Pin
+        c = self._c
+        F = self._F
+        cF2 = c*F*F
+        self._output_values[0] = Pin - 4*cF2
+        return self._output_values
 
     def evaluate_jacobian_outputs(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
-        irow = np.asarray([0, 0, 0], dtype=np.int64)
-        jcol = np.asarray([0, 1, 2], dtype=np.int64)
-        nonzeros = np.asarray([1, -4*F**2, -4*c*2*F], dtype=np.float64)
-        jac = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(1,3))
-        return jac
+        c = self._c
+        F = self._F
+        F2 = F*F
+        cF = c*F
+        data = self._jac_o.data
+        data[1] = -4*F2
+        data[2] = -8*cF
+        return self._jac_o
+
+    # vectorized evaluation of the outputs and the jacobian nonzeros
+    # (in the order of evaluate_jacobian_outputs) for a sweep over the
+    # rows of X, each row being one set of input values
+    def evaluate_batch_outputs(self, X):
+        Pin = X[:,0]
+        c = X[:,1]
+        F = X[:,2]
+        F2 = F*F
+        cF = c*F
+        o = (Pin - 4*c*F2)[:,None]
+        jac_data = np.stack([np.ones_like(F), -4*F2, -8*cF], axis=1)
+        return o, jac_data
 
 class PressureDropSingleOutputWithHessian(PressureDropSingleOutput):
     def __init__(self):
@@ -142,12 +197,12 @@ class PressureDropSingleOutputWithHessian(PressureDropSingleOutput):
         np.copyto(self._output_con_mult_values, output_con_multiplier_values)
 
     def evaluate_hessian_outputs(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
-        irow = np.asarray([2, 2], dtype=np.int64)
-        jcol = np.asarray([1, 2], dtype=np.int64)
+        c = self._c
+        F = self._F
+        irow = _IROW_HESS
+        jcol = _JCOL_HESS
         data = self._output_con_mult_values[0]*np.asarray([-8*F, -8*c], dtype=np.float64)
-        hess = spa.coo_matrix((data, (irow, jcol)), shape=(3,3))
+        hess = _coo((data, (irow, jcol)), shape=(3,3))
         return hess
 
 class PressureDropSingleEquality(ExternalGreyBoxModel):
@@ -155,36 +210,59 @@ class PressureDropSingleEquality(ExternalGreyBoxModel):
     #   o = {empty}
     #   h_eq(u) = [Pout - (Pin - 4*c*F^2]
     #   h_o(u) = {empty}
+    _INPUT_NAMES = ('Pin', 'c', 'F', 'Pout')
+    _EQ_NAMES = ('pdrop',)
+
     def __init__(self):
-        self._input_names = ['Pin', 'c', 'F', 'Pout']
         self._input_values = np.zeros(4, dtype=np.float64)
-        self._equality_constraint_names = ['pdrop']
+        # python float copies of the inputs used by the evaluate methods
+        self._Pin = self._c = self._F = self._Pout = 0.0
+        self._eq_con_values = np.zeros(1, dtype=np.float64)
+        self._jac_eq = _coo(
+            (np.asarray([-1, 0, 0, 1], dtype=np.float64), (_IROW_PDSE, _JCOL_PDSE)),
+            shape=(1,4))
 
     def input_names(self):
-        return self._input_names
+        return self._INPUT_NAMES
 
     def equality_constraint_names(self):
-        return self._equality_constraint_names
+        return self._EQ_NAMES
 
     def set_input_values(self, input_values):
         assert len(input_values) == 4
-        np.copyto(self._input_values, input_values)
+        self._input_values[:] = input_values
+        self._Pin, self._c, self._F, self._Pout = self._input_values.tolist()
 
     def evaluate_equality_constraints(self):
-        Pin = self._input_values[0]
-        c = self._input_values[1]
-        F = self._input_values[2]
-        Pout = self._input_values[3]
-        return np.asarray([Pout - (Pin - 4*c*F**2)], dtype=np.float64)
+        Pin = self._Pin
+        c = self._c
+        F = self._F
+        Pout = self._Pout
+        cF2 = c*F*F
+        self._eq_con_values[0] = Pout - (Pin - 4*cF2)
+        return self._eq_con_values
 
     def evaluate_jacobian_equality_constraints(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
-        irow = np.asarray([0, 0, 0, 0], dtype=np.int64)
-        jcol = np.asarray([0, 1, 2, 3], dtype=np.int64)
-        nonzeros = np.asarray([-1, 4*F**2, 4*2*c*F, 1], dtype=np.float64)
-        jac = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(1,4))
-        return jac
+        c = self._c
+        F = self._F
+        F2 = F*F
+        cF = c*F
+        data = self._jac_eq.data
+        data[1] = 4*F2
+        data[2] = 8*cF
+        return self._jac_eq
+
+    def evaluate_batch_equality_constraints(self, X):
+        Pin = X[:,0]
+        c = X[:,1]
+        F = X[:,2]
+        Pout = X[:,3]
+        F2 = F*F
+        cF = c*F
+        eq = (Pout - (Pin - 4*c*F2))[:,None]
+        ones = np.ones_like(F)
+        jac_data = np.stack([-ones, 4*F2, 8*cF, ones], axis=1)
+        return eq, jac_data
 
 class PressureDropSingleEqualityWithHessian(PressureDropSingleEquality):
     #   u = [Pin, c, F, Pout]
@@ -200,12 +278,12 @@ class PressureDropSingleEqualityWithHessian(PressureDropSingleEquality):
         np.copyto(self._eq_con_mult_values, eq_con_multiplier_values)
 
     def evaluate_hessian_equality_constraints(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
-        irow = np.asarray([2, 2], dtype=np.int64)
-        jcol = np.asarray([1, 2], dtype=np.int64)
+        c = self._c
+        F = self._F
+        irow = _IROW_HESS
+        jcol = _JCOL_HESS
         nonzeros = self._eq_con_mult_values[0]*np.asarray([8*F, 8*c], dtype=np.float64)
-        hess = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(4,4))
+        hess = _coo((nonzeros, (irow, jcol)), shape=(4,4))
         return hess
 
 class PressureDropTwoOutputs(ExternalGreyBoxModel):
@@ -214,40 +292,66 @@ class PressureDropTwoOutputs(ExternalGreyBoxModel):
     #   h_eq(u) = {empty}
     #   h_o(u) = [Pin - 2*c*F^2]
     #            [Pin - 4*c*F^2]
+    _INPUT_NAMES = ('Pin', 'c', 'F')
+    _OUT_NAMES = ('P2', 'Pout')
+
     def __init__(self):
-        self._input_names = ['Pin', 'c', 'F']
         self._input_values = np.zeros(3, dtype=np.float64)
-        self._output_names = ['P2', 'Pout']
+        # python float copies of the inputs used by the evaluate methods
+        self._Pin = self._c = self._F = 0.0
+        self._output_values = np.zeros(2, dtype=np.float64)
+        self._jac_o = _coo(
+            (np.asarray([1, 0, 0, 1, 0, 0], dtype=np.float64), (_IROW_PDTO, _JCOL_PDTO)),
+            shape=(2,3))
 
     def input_names(self):
-        return self._input_names
+        return self._INPUT_NAMES
 
     def output_names(self):
-        return self._output_names
+        return self._OUT_NAMES
 
     def set_input_values(self, input_values):
         assert len(input_values) == 3
-        np.copyto(self._input_values, input_values)
+        self._input_values[:] = input_values
+        self._Pin, self._c, self._F = self._input_values.tolist()
 
     def evaluate_equality_constraints(self):
         raise NotImplementedError('This method should not be called for this model.')
 
     def evaluate_outputs(self):
-        Pin = self._input_values[0]
-        c = self._input_values[1]
-        F = self._input_values[2]
-        P2 = Pin - 2*c*F**2
-        Pout = Pin - 4*c*F**2
-        return np.asarray([P2, Pout], dtype=np.float64)
+        Pin = self._Pin
+        c = self._c
+        F = self._F
+        cF2 = c*F*F
+        out = self._output_values
+        out[0] = Pin - 2*cF2
+        out[1] = Pin - 4*cF2
+        return out
 
     def evaluate_jacobian_outputs(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
-        irow = np.asarray([0, 0, 0, 1, 1, 1], dtype=np.int64)
-        jcol = np.asarray([0, 1, 2, 0, 1, 2], dtype=np.int64)
-        nonzeros = np.asarray([1, -2*F**2, -2*c*2*F, 1, -4*F**2, -4*c*2*F], dtype=np.float64)
-        jac = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(2,3))
-        return jac
+        c = self._c
+        F = self._F
+        F2 = F*F
+        cF = c*F
+        data = self._jac_o.data
+        data[1] = -2*F2
+        data[2] = -4*cF
+        data[4] = -4*F2
+        data[5] = -8*cF
+        return self._jac_o
+
+    def evaluate_batch_outputs(self, X):
+        Pin = X[:,0]
+        c = X[:,1]
+        F = X[:,2]
+        F2 = F*F
+        cF = c*F
+        cF2 = c*F2
+        o = np.stack([Pin - 2*cF2, Pin - 4*cF2], axis=1)
+        ones = np.ones_like(F)
+        jac_data = np.stack(
+            [ones, -2*F2, -4*cF, ones, -4*F2, -8*cF], axis=1)
+        return o, jac_data
 
 class PressureDropTwoOutputsWithHessian(PressureDropTwoOutputs):
     #   u = [Pin, c, F]
@@ -263,14 +367,14 @@ class PressureDropTwoOutputsWithHessian(PressureDropTwoOutputs):
         np.copyto(self._output_con_mult_values, output_con_multiplier_values)
 
     def evaluate_hessian_outputs(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
+        c = self._c
+        F = self._F
         y1 = self._output_con_mult_values[0]
         y2 = self._output_con_mult_values[1]
-        irow = np.asarray([2, 2], dtype=np.int64)
-        jcol = np.asarray([1, 2], dtype=np.int64)
+        irow = _IROW_HESS
+        jcol = _JCOL_HESS
         nonzeros = np.asarray([y1*(-4*F) + y2*(-8*F), y1*(-4*c)+y2*(-8*c)], dtype=np.float64)
-        hess = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(3,3))
+        hess = _coo((nonzeros, (irow, jcol)), shape=(3,3))
         return hess
 
 class PressureDropTwoEqualities(ExternalGreyBoxModel):
@@ -279,37 +383,67 @@ class PressureDropTwoEqualities(ExternalGreyBoxModel):
     #   h_eq(u) = [P2 - (Pin - 2*c*F^2]
     #             [Pout - (P2 - 2*c*F^2]
     #   h_o(u) = {empty}
+    _INPUT_NAMES = ('Pin', 'c', 'F', 'P2', 'Pout')
+    _EQ_NAMES = ('pdrop2', 'pdropout')
+
     def __init__(self):
-        self._input_names = ['Pin', 'c', 'F', 'P2', 'Pout']
         self._input_values = np.zeros(5, dtype=np.float64)
-        self._equality_constraint_names = ['pdrop2', 'pdropout']
+        # python float copies of the inputs used by the evaluate methods
+        self._Pin = self._c = self._F = self._P2 = self._Pout = 0.0
+        self._eq_con_values = np.zeros(2, dtype=np.float64)
+        self._jac_eq = _coo(
+            (np.asarray([-1, 0, 0, 1, 0, 0, -1, 1], dtype=np.float64), (_IROW_PDTE, _JCOL_PDTE)),
+            shape=(2,5))
 
     def input_names(self):
-        return self._input_names
+        return self._INPUT_NAMES
 
     def equality_constraint_names(self):
-        return self._equality_constraint_names
+        return self._EQ_NAMES
 
     def set_input_values(self, input_values):
         assert len(input_values) == 5
-        np.copyto(self._input_values, input_values)
+        self._input_values[:] = input_values
+        self._Pin, self._c, self._F, self._P2, self._Pout = self._input_values.tolist()
 
     def evaluate_equality_constraints(self):
-        Pin = self._input_values[0]
-        c = self._input_values[1]
-        F = self._input_values[2]
-        P2 = self._input_values[3]
-        Pout = self._input_values[4]
-        return np.asarray([P2 - (Pin - 2*c*F**2), Pout - (P2 - 2*c*F**2)], dtype=np.float64)
+        Pin = self._Pin
+        c = self._c
+        F = self._F
+        P2 = self._P2
+        Pout = self._Pout
+        dP = 2*c*F*F
+        out = self._eq_con_values
+        out[0] = P2 - (Pin - dP)
+        out[1] = Pout - (P2 - dP)
+        return out
 
     def evaluate_jacobian_equality_constraints(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
-        irow = np.asarray([0, 0, 0, 0, 1, 1, 1, 1], dtype=np.int64)
-        jcol = np.asarray([0, 1, 2, 3, 1, 2, 3, 4], dtype=np.int64)
-        nonzeros = np.asarray([-1, 2*F**2, 2*2*c*F, 1, 2*F**2, 2*2*c*F, -1, 1], dtype=np.float64)
-        jac = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(2,5))
-        return jac
+        c = self._c
+        F = self._F
+        dP_dc = 2*F*F
+        dP_dF = 4*c*F
+        data = self._jac_eq.data
+        data[1] = dP_dc
+        data[2] = dP_dF
+        data[4] = dP_dc
+        data[5] = dP_dF
+        return self._jac_eq
+
+    def evaluate_batch_equality_constraints(self, X):
+        Pin = X[:,0]
+        c = X[:,1]
+        F = X[:,2]
+        P2 = X[:,3]
+        Pout = X[:,4]
+        dP = 2*c*F*F
+        eq = np.stack([P2 - (Pin - dP), Pout - (P2 - dP)], axis=1)
+        dP_dc = 2*F*F
+        dP_dF = 4*c*F
+        ones = np.ones_like(F)
+        jac_data = np.stack(
+            [-ones, dP_dc, dP_dF, ones, dP_dc, dP_dF, -ones, ones], axis=1)
+        return eq, jac_data
 
 class PressureDropTwoEqualitiesWithHessian(PressureDropTwoEqualities):
     #   u = [Pin, c, F, P2, Pout]
@@ -326,15 +460,15 @@ class PressureDropTwoEqualitiesWithHessian(PressureDropTwoEqualities):
         np.copyto(self._eq_con_mult_values, eq_con_multiplier_values)
 
     def evaluate_hessian_equality_constraints(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
+        c = self._c
+        F = self._F
         y1 = self._eq_con_mult_values[0]
         y2 = self._eq_con_mult_values[1]
 
-        irow = np.asarray([2, 2], dtype=np.int64)
-        jcol = np.asarray([1, 2], dtype=np.int64)
+        irow = _IROW_HESS
+        jcol = _JCOL_HESS
         nonzeros = np.asarray([y1*(4*F) + y2*(4*F), y1*(4*c)+y2*(4*c)], dtype=np.float64)
-        hess = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(5,5))
+        hess = _coo((nonzeros, (irow, jcol)), shape=(5,5))
         return hess
 
 class PressureDropTwoEqualitiesTwoOutputs(ExternalGreyBoxModel):
@@ -344,57 +478,112 @@ class PressureDropTwoEqualitiesTwoOutputs(ExternalGreyBoxModel):
     #             [P3 - (P1 - 2*c*F^2]
     #   h_o(u) = [P1 - c*F^2]
     #            [Pin - 4*c*F^2]
+    _INPUT_NAMES = ('Pin', 'c', 'F', 'P1', 'P3')
+    _EQ_NAMES = ('pdrop1', 'pdrop3')
+    _OUT_NAMES = ('P2', 'Pout')
+
     def __init__(self):
-        self._input_names = ['Pin', 'c', 'F', 'P1', 'P3']
         self._input_values = np.zeros(5, dtype=np.float64)
-        self._equality_constraint_names = ['pdrop1', 'pdrop3']
-        self._output_names = ['P2', 'Pout']
+        # python float copies of the inputs used by the evaluate methods
+        self._Pin = self._c = self._F = self._P1 = self._P3 = 0.0
+        self._eq_con_values = np.zeros(2, dtype=np.float64)
+        self._output_values = np.zeros(2, dtype=np.float64)
+        self._jac_eq = _coo(
+            (np.asarray([-1, 0, 0, 1, 0, 0, -1, 1], dtype=np.float64), (_IROW_EQ_PDTETO, _JCOL_EQ_PDTETO)),
+            shape=(2,5))
+        self._jac_o = _coo(
+            (np.asarray([0, 0, 1, 1, 0, 0], dtype=np.float64), (_IROW_O_PDTETO, _JCOL_O_PDTETO)),
+            shape=(2,5))
 
     def input_names(self):
-        return self._input_names
+        return self._INPUT_NAMES
 
     def equality_constraint_names(self):
-        return self._equality_constraint_names
+        return self._EQ_NAMES
 
     def output_names(self):
-        return self._output_names
+        return self._OUT_NAMES
 
     def set_input_values(self, input_values):
         assert len(input_values) == 5
-        np.copyto(self._input_values, input_values)
+        self._input_values[:] = input_values
+        self._Pin, self._c, self._F, self._P1, self._P3 = self._input_values.tolist()
 
     def evaluate_equality_constraints(self):
-        Pin = self._input_values[0]
-        c = self._input_values[1]
-        F = self._input_values[2]
-        P1 = self._input_values[3]
-        P3 = self._input_values[4]
-        return np.asarray([P1 - (Pin - c*F**2), P3 - (P1 - 2*c*F**2)], dtype=np.float64)
+        Pin = self._Pin
+        c = self._c
+        F = self._F
+        P1 = self._P1
+        P3 = self._P3
+        cF2 = c*F*F
+        out = self._eq_con_values
+        out[0] = P1 - (Pin - cF2)
+        out[1] = P3 - (P1 - 2*cF2)
+        return out
 
     def evaluate_outputs(self):
-        Pin = self._input_values[0]
-        c = self._input_values[1]
-        F = self._input_values[2]
-        P1 = self._input_values[3]
-        return np.asarray([P1 - c*F**2, Pin - 4*c*F**2], dtype=np.float64)
+        Pin = self._Pin
+        c = self._c
+        F = self._F
+        P1 = self._P1
+        cF2 = c*F*F
+        out = self._output_values
+        out[0] = P1 - cF2
+        out[1] = Pin - 4*cF2
+        return out
 
     def evaluate_jacobian_equality_constraints(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
-        irow = np.asarray([0, 0, 0, 0, 1, 1, 1, 1], dtype=np.int64)
-        jcol = np.asarray([0, 1, 2, 3, 1, 2, 3, 4], dtype=np.int64)
-        nonzeros = np.asarray([-1, F**2, 2*c*F, 1, 2*F**2, 4*c*F, -1, 1], dtype=np.float64)
-        jac = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(2,5))
-        return jac
+        c = self._c
+        F = self._F
+        F2 = F*F
+        cF = c*F
+        data = self._jac_eq.data
+        data[1] = F2
+        data[2] = 2*cF
+        data[4] = 2*F2
+        data[5] = 4*cF
+        return self._jac_eq
 
     def evaluate_jacobian_outputs(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
-        irow = np.asarray([0, 0, 0, 1, 1, 1], dtype=np.int64)
-        jcol = np.asarray([1, 2, 3, 0, 1, 2], dtype=np.int64)
-        nonzeros = np.asarray([-F**2, -c*2*F, 1, 1, -4*F**2, -4*c*2*F], dtype=np.float64)
-        jac = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(2,5))
-        return jac
+        c = self._c
+        F = self._F
+        F2 = F*F
+        cF = c*F
+        data = self._jac_o.data
+        data[0] = -F2
+        data[1] = -2*cF
+        data[4] = -4*F2
+        data[5] = -8*cF
+        return self._jac_o
+
+    def evaluate_batch_equality_constraints(self, X):
+        Pin = X[:,0]
+        c = X[:,1]
+        F = X[:,2]
+        P1 = X[:,3]
+        P3 = X[:,4]
+        F2 = F*F
+        cF = c*F
+        cF2 = c*F2
+        eq = np.stack([P1 - (Pin - cF2), P3 - (P1 - 2*cF2)], axis=1)
+        ones = np.ones_like(F)
+        jac_data = np.stack(
+            [-ones, F2, 2*cF, ones, 2*F2, 4*cF, -ones, ones], axis=1)
+        return eq, jac_data
+
+    def evaluate_batch_outputs(self, X):
+        Pin = X[:,0]
+        c = X[:,1]
+        F = X[:,2]
+        P1 = X[:,3]
+        F2 = F*F
+        cF = c*F
+        cF2 = c*F2
+        o = np.stack([P1 - cF2, Pin - 4*cF2], axis=1)
+        ones = np.ones_like(F)
+        jac_data = np.stack(
+            [-F2, -2*cF, ones, ones, -4*F2, -8*cF], axis=1)
+        return o, jac_data
 
 
 class PressureDropTwoEqualitiesTwoOutputsWithHessian(PressureDropTwoEqualitiesTwoOutputs):
@@ -418,25 +607,25 @@ class PressureDropTwoEqualitiesTwoOutputsWithHessian(PressureDropTwoEqualitiesTw
         np.copyto(self._output_con_mult_values, output_con_multiplier_values)
 
     def evaluate_hessian_equality_constraints(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
+        c = self._c
+        F = self._F
         y1 = self._eq_con_mult_values[0]
         y2 = self._eq_con_mult_values[1]
-        irow = np.asarray([2, 2], dtype=np.int64)
-        jcol = np.asarray([1, 2], dtype=np.int64)
+        irow = _IROW_HESS
+        jcol = _JCOL_HESS
         nonzeros = np.asarray([y1*(2*F) + y2*(4*F), y1*(2*c)+y2*(4*c)], dtype=np.float64)
-        hess = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(5,5))
+        hess = _coo((nonzeros, (irow, jcol)), shape=(5,5))
         return hess
 
     def evaluate_hessian_outputs(self):
-        c = self._input_values[1]
-        F = self._input_values[2]
+        c = self._c
+        F = self._F
         y1 = self._output_con_mult_values[0]
         y2 = self._output_con_mult_values[1]
-        irow = np.asarray([2, 2], dtype=np.int64)
-        jcol = np.asarray([1, 2], dtype=np.int64)
+        irow = _IROW_HESS
+        jcol = _JCOL_HESS
         nonzeros = np.asarray([y1*(-2*F) + y2*(-8*F), y1*(-2*c)+y2*(-8*c)], dtype=np.float64)
-        hess = spa.coo_matrix((nonzeros, (irow, jcol)), shape=(3,3))
+        hess = _coo((nonzeros, (irow, jcol)), shape=(3,3))
         return hess
 
 """
@@ -506,6 +695,13 @@ class PressureDropTwoEqualitiesTwoOutputsNoHessian(ExternalGreyBoxModel):
         return jac
 """
 
+class PressureDropTwoEqualitiesTwoOutputsCSR(PressureDropTwoEqualitiesTwoOutputs):
+    def evaluate_jacobian_equality_constraints(self):
+        return super(PressureDropTwoEqualitiesTwoOutputsCSR, self).evaluate_jacobian_equality_constraints().tocsr()
+
+    def evaluate_jacobian_outputs(self):
+        return super(PressureDropTwoEqualitiesTwoOutputsCSR, self).evaluate_jacobian_outputs().tocsr()
+
 class PressureDropTwoEqualitiesTwoOutputsScaleBoth(PressureDropTwoEqualitiesTwoOutputs):
     def get_equality_constraint_scaling_factors(self):
         return np.asarray([3.1, 3.2], dtype=np.float64)
@@ -521,17 +717,80 @@ class PressureDropTwoEqualitiesTwoOutputsScaleOutputs(PressureDropTwoEqualitiesT
     def get_output_constraint_scaling_factors(self):
         return np.asarray([4.1, 4.2])
 
+def _drop_first_entry(jac):
+    return _coo((jac.data[1:], (jac.row[1:], jac.col[1:])), shape=jac.shape)
+
+class PressureDropTwoEqualitiesTwoOutputsInconsistent(PressureDropTwoEqualitiesTwoOutputs):
+    # drops the first entry of the residuals or jacobian selected by
+    # "drop" to check the errors raised for results of the wrong size
+    def __init__(self):
+        super(PressureDropTwoEqualitiesTwoOutputsInconsistent, self).__init__()
+        self.drop = None
+
+    def evaluate_equality_constraints(self):
+        eq = super(PressureDropTwoEqualitiesTwoOutputsInconsistent, self).evaluate_equality_constraints()
+        return eq[1:] if self.drop == 'equality_constraints' else eq
+
+    def evaluate_outputs(self):
+        o = super(PressureDropTwoEqualitiesTwoOutputsInconsistent, self).evaluate_outputs()
+        return o[1:] if self.drop == 'outputs' else o
+
+    def evaluate_jacobian_equality_constraints(self):
+        jac = super(PressureDropTwoEqualitiesTwoOutputsInconsistent, self).evaluate_jacobian_equality_constraints()
+        return _drop_first_entry(jac) if self.drop == 'jacobian_equality_constraints' else jac
+
+    def evaluate_jacobian_outputs(self):
+        jac = super(PressureDropTwoEqualitiesTwoOutputsInconsistent, self).evaluate_jacobian_outputs()
+        return _drop_first_entry(jac) if self.drop == 'jacobian_outputs' else jac
+
+
+# expected values for the models above at the inputs used in
+# TestExternalGreyBoxModel (shared by the tests with and without hessians)
+_EXP_O_PDSO = np.asarray([28], dtype=np.float64)
+_EXP_JAC_O_ROW_PDSO = np.asarray([0,0,0], dtype=np.int64)
+_EXP_JAC_O_COL_PDSO = np.asarray([0,1,2], dtype=np.int64)
+_EXP_JAC_O_DATA_PDSO = np.asarray([1,-36,-48], dtype=np.float64)
+
+_EXP_EQ_PDSE = np.asarray([22], dtype=np.float64)
+_EXP_JAC_EQ_ROW_PDSE = np.asarray([0,0,0,0], dtype=np.int64)
+_EXP_JAC_EQ_COL_PDSE = np.asarray([0,1,2,3], dtype=np.int64)
+_EXP_JAC_EQ_DATA_PDSE = np.asarray([-1, 36, 48, 1], dtype=np.float64)
+
+_EXP_O_PDTO = np.asarray([64, 28], dtype=np.float64)
+_EXP_JAC_O_ROW_PDTO = np.asarray([0,0,0,1,1,1], dtype=np.int64)
+_EXP_JAC_O_COL_PDTO = np.asarray([0,1,2,0,1,2], dtype=np.int64)
+_EXP_JAC_O_DATA_PDTO = np.asarray([1, -18, -24, 1,-36,-48], dtype=np.float64)
+
+_EXP_EQ_PDTE = np.asarray([-44, 66], dtype=np.float64)
+_EXP_JAC_EQ_ROW_PDTE = np.asarray([0,0,0,0,1,1,1,1], dtype=np.int64)
+_EXP_JAC_EQ_COL_PDTE = np.asarray([0,1,2,3,1,2,3,4], dtype=np.int64)
+_EXP_JAC_EQ_DATA_PDTE = np.asarray([-1, 18, 24, 1, 18, 24, -1, 1], dtype=np.float64)
+
+_EXP_EQ_PDTETO = np.asarray([-2, 26], dtype=np.float64)
+_EXP_O_PDTETO = np.asarray([62, 28], dtype=np.float64)
+_EXP_JAC_EQ_ROW_PDTETO = np.asarray([0,0,0,0,1,1,1,1], dtype=np.int64)
+_EXP_JAC_EQ_COL_PDTETO = np.asarray([0,1,2,3,1,2,3,4], dtype=np.int64)
+_EXP_JAC_EQ_DATA_PDTETO = np.asarray([-1, 9, 12, 1, 18, 24, -1, 1], dtype=np.float64)
+_EXP_JAC_O_ROW_PDTETO = np.asarray([0,0,0,1,1,1], dtype=np.int64)
+_EXP_JAC_O_COL_PDTETO = np.asarray([1,2,3,0,1,2], dtype=np.int64)
+_EXP_JAC_O_DATA_PDTETO = np.asarray([-9, -12, 1, 1, -36, -48], dtype=np.float64)
+
 
 class TestExternalGreyBoxModel(unittest.TestCase):
 
+    def _assert_coo_equal(self, m, row, col, data):
+        np.testing.assert_array_equal(m.row, row)
+        np.testing.assert_array_equal(m.col, col)
+        np.testing.assert_array_equal(m.data, data)
+
     def test_pressure_drop_single_output(self):
         egbm = PressureDropSingleOutput()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F'))
         eq_con_names = egbm.equality_constraint_names()
         self.assertEqual(eq_con_names, [])
         output_names = egbm.output_names()
-        self.assertEqual(output_names, ['Pout'])
+        self.assertEqual(output_names, ('Pout',))
 
         egbm.set_input_values(np.asarray([100, 2, 3], dtype=np.float64))
         egbm.set_equality_constraint_multipliers(np.asarray([], dtype=np.float64))
@@ -543,15 +802,14 @@ class TestExternalGreyBoxModel(unittest.TestCase):
             tmp = egbm.evaluate_equality_constraints()
 
         o = egbm.evaluate_outputs()
-        self.assertTrue(np.array_equal(o, np.asarray([28], dtype=np.float64)))
+        np.testing.assert_array_equal(o, _EXP_O_PDSO)
 
         with self.assertRaises(NotImplementedError):
             tmp = egbm.evaluate_jacobian_equality_constraints()
 
         jac_o = egbm.evaluate_jacobian_outputs()
-        self.assertTrue(np.array_equal(jac_o.row, np.asarray([0,0,0], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.col, np.asarray([0,1,2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.data, np.asarray([1,-36,-48], dtype=np.float64)))
+        self._assert_coo_equal(jac_o, _EXP_JAC_O_ROW_PDSO,
+                               _EXP_JAC_O_COL_PDSO, _EXP_JAC_O_DATA_PDSO)
 
         with self.assertRaises(AttributeError):
             eq_hess = egbm.evaluate_hessian_equality_constraints()
@@ -562,11 +820,11 @@ class TestExternalGreyBoxModel(unittest.TestCase):
     def test_pressure_drop_single_output_with_hessian(self):
         egbm = PressureDropSingleOutputWithHessian()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F'))
         eq_con_names = egbm.equality_constraint_names()
         self.assertEqual(eq_con_names, [])
         output_names = egbm.output_names()
-        self.assertEqual(output_names, ['Pout'])
+        self.assertEqual(output_names, ('Pout',))
 
         egbm.set_input_values(np.asarray([100, 2, 3], dtype=np.float64))
         egbm.set_equality_constraint_multipliers(np.asarray([], dtype=np.float64))
@@ -578,29 +836,28 @@ class TestExternalGreyBoxModel(unittest.TestCase):
             tmp = egbm.evaluate_equality_constraints()
 
         o = egbm.evaluate_outputs()
-        self.assertTrue(np.array_equal(o, np.asarray([28], dtype=np.float64)))
+        np.testing.assert_array_equal(o, _EXP_O_PDSO)
 
         with self.assertRaises(NotImplementedError):
             tmp = egbm.evaluate_jacobian_equality_constraints()
 
         jac_o = egbm.evaluate_jacobian_outputs()
-        self.assertTrue(np.array_equal(jac_o.row, np.asarray([0,0,0], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.col, np.asarray([0,1,2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.data, np.asarray([1,-36,-48], dtype=np.float64)))
+        self._assert_coo_equal(jac_o, _EXP_JAC_O_ROW_PDSO,
+                               _EXP_JAC_O_COL_PDSO, _EXP_JAC_O_DATA_PDSO)
 
         with self.assertRaises(AttributeError):
             eq_hess = egbm.evaluate_hessian_equality_constraints()
         outputs_hess = egbm.evaluate_hessian_outputs()
-        self.assertTrue(np.array_equal(outputs_hess.row, np.asarray([2, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(outputs_hess.col, np.asarray([1, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(outputs_hess.data, np.asarray([5*(-8*3), 5*(-8*2)], dtype=np.int64)))
+        np.testing.assert_array_equal(outputs_hess.row, np.asarray([2, 2], dtype=np.int64))
+        np.testing.assert_array_equal(outputs_hess.col, np.asarray([1, 2], dtype=np.int64))
+        np.testing.assert_array_equal(outputs_hess.data, np.asarray([5*(-8*3), 5*(-8*2)], dtype=np.int64))
 
     def test_pressure_drop_single_equality(self):
         egbm = PressureDropSingleEquality()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F', 'Pout'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F', 'Pout'))
         eq_con_names = egbm.equality_constraint_names()
-        self.assertEqual(eq_con_names, ['pdrop'])
+        self.assertEqual(eq_con_names, ('pdrop',))
         output_names = egbm.output_names()
         self.assertEqual(output_names, [])
 
@@ -610,7 +867,7 @@ class TestExternalGreyBoxModel(unittest.TestCase):
             egbm.set_output_constraint_multipliers(np.asarray([1], dtype=np.float64))
 
         eq = egbm.evaluate_equality_constraints()
-        self.assertTrue(np.array_equal(eq, np.asarray([22], dtype=np.float64)))
+        np.testing.assert_array_equal(eq, _EXP_EQ_PDSE)
 
         with self.assertRaises(NotImplementedError):
             tmp = egbm.evaluate_outputs()
@@ -619,9 +876,8 @@ class TestExternalGreyBoxModel(unittest.TestCase):
             tmp = egbm.evaluate_jacobian_outputs()
 
         jac_eq = egbm.evaluate_jacobian_equality_constraints()
-        self.assertTrue(np.array_equal(jac_eq.row, np.asarray([0,0,0,0], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.col, np.asarray([0,1,2,3], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.data, np.asarray([-1, 36, 48, 1], dtype=np.float64)))
+        self._assert_coo_equal(jac_eq, _EXP_JAC_EQ_ROW_PDSE,
+                               _EXP_JAC_EQ_COL_PDSE, _EXP_JAC_EQ_DATA_PDSE)
 
         with self.assertRaises(AttributeError):
             eq_hess = egbm.evaluate_hessian_equality_constraints()
@@ -631,9 +887,9 @@ class TestExternalGreyBoxModel(unittest.TestCase):
     def test_pressure_drop_single_equality_with_hessian(self):
         egbm = PressureDropSingleEqualityWithHessian()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F', 'Pout'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F', 'Pout'))
         eq_con_names = egbm.equality_constraint_names()
-        self.assertEqual(eq_con_names, ['pdrop'])
+        self.assertEqual(eq_con_names, ('pdrop',))
         output_names = egbm.output_names()
         self.assertEqual(output_names, [])
 
@@ -643,7 +899,7 @@ class TestExternalGreyBoxModel(unittest.TestCase):
             egbm.set_output_constraint_multipliers(np.asarray([1], dtype=np.float64))
 
         eq = egbm.evaluate_equality_constraints()
-        self.assertTrue(np.array_equal(eq, np.asarray([22], dtype=np.float64)))
+        np.testing.assert_array_equal(eq, _EXP_EQ_PDSE)
 
         with self.assertRaises(NotImplementedError):
             tmp = egbm.evaluate_outputs()
@@ -652,26 +908,28 @@ class TestExternalGreyBoxModel(unittest.TestCase):
             tmp = egbm.evaluate_jacobian_outputs()
 
         jac_eq = egbm.evaluate_jacobian_equality_constraints()
-        self.assertTrue(np.array_equal(jac_eq.row, np.asarray([0,0,0,0], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.col, np.asarray([0,1,2,3], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.data, np.asarray([-1, 36, 48, 1], dtype=np.float64)))
+        self._assert_coo_equal(jac_eq, _EXP_JAC_EQ_ROW_PDSE,
+                               _EXP_JAC_EQ_COL_PDSE, _EXP_JAC_EQ_DATA_PDSE)
 
         eq_hess = egbm.evaluate_hessian_equality_constraints()
         with self.assertRaises(AttributeError):
             outputs_hess = egbm.evaluate_hessian_outputs()
-        self.assertTrue(np.array_equal(eq_hess.row, np.asarray([2, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(eq_hess.col, np.asarray([1, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(eq_hess.data, np.asarray([5*(8*3), 5*(8*2)], dtype=np.float64)))
+        np.testing.assert_array_equal(eq_hess.row, np.asarray([2, 2], dtype=np.int64))
+        np.testing.assert_array_equal(eq_hess.col, np.asarray([1, 2], dtype=np.int64))
+        np.testing.assert_array_equal(eq_hess.data, np.asarray([5*(8*3), 5*(8*2)], dtype=np.float64))
 
     def test_pressure_drop_two_outputs(self):
         egbm = PressureDropTwoOutputs()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F'))
         eq_con_names = egbm.equality_constraint_names()
         self.assertEqual([], eq_con_names)
         output_names = egbm.output_names()
-        self.assertEqual(output_names, ['P2', 'Pout'])
+        self.assertEqual(output_names, ('P2', 'Pout'))
 
+        # a single value would broadcast into all of the inputs
+        with self.assertRaises(AssertionError):
+            egbm.set_input_values(np.asarray([5], dtype=np.float64))
         egbm.set_input_values(np.asarray([100, 2, 3], dtype=np.float64))
         egbm.set_equality_constraint_multipliers(np.asarray([], dtype=np.float64))
         # this one should fail
@@ -690,15 +948,14 @@ class TestExternalGreyBoxModel(unittest.TestCase):
         #            [Pin - 4*c*F^2]
             
         o = egbm.evaluate_outputs()
-        self.assertTrue(np.array_equal(o, np.asarray([64, 28], dtype=np.float64)))
+        np.testing.assert_array_equal(o, _EXP_O_PDTO)
 
         with self.assertRaises(NotImplementedError):
             tmp = egbm.evaluate_jacobian_equality_constraints()
 
         jac_o = egbm.evaluate_jacobian_outputs()
-        self.assertTrue(np.array_equal(jac_o.row, np.asarray([0,0,0,1,1,1], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.col, np.asarray([0,1,2,0,1,2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.data, np.asarray([1, -18, -24, 1,-36,-48], dtype=np.float64)))
+        self._assert_coo_equal(jac_o, _EXP_JAC_O_ROW_PDTO,
+                               _EXP_JAC_O_COL_PDTO, _EXP_JAC_O_DATA_PDTO)
 
         with self.assertRaises(AttributeError):
             hess_eq = egbm.evaluate_hessian_equality_constraints()
@@ -708,11 +965,11 @@ class TestExternalGreyBoxModel(unittest.TestCase):
     def test_pressure_drop_two_outputs_with_hessian(self):
         egbm = PressureDropTwoOutputsWithHessian()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F'))
         eq_con_names = egbm.equality_constraint_names()
         self.assertEqual([], eq_con_names)
         output_names = egbm.output_names()
-        self.assertEqual(output_names, ['P2', 'Pout'])
+        self.assertEqual(output_names, ('P2', 'Pout'))
 
         egbm.set_input_values(np.asarray([100, 2, 3], dtype=np.float64))
         egbm.set_equality_constraint_multipliers(np.asarray([], dtype=np.float64))
@@ -732,29 +989,28 @@ class TestExternalGreyBoxModel(unittest.TestCase):
         #            [Pin - 4*c*F^2]
             
         o = egbm.evaluate_outputs()
-        self.assertTrue(np.array_equal(o, np.asarray([64, 28], dtype=np.float64)))
+        np.testing.assert_array_equal(o, _EXP_O_PDTO)
 
         with self.assertRaises(NotImplementedError):
             tmp = egbm.evaluate_jacobian_equality_constraints()
 
         jac_o = egbm.evaluate_jacobian_outputs()
-        self.assertTrue(np.array_equal(jac_o.row, np.asarray([0,0,0,1,1,1], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.col, np.asarray([0,1,2,0,1,2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.data, np.asarray([1, -18, -24, 1,-36,-48], dtype=np.float64)))
+        self._assert_coo_equal(jac_o, _EXP_JAC_O_ROW_PDTO,
+                               _EXP_JAC_O_COL_PDTO, _EXP_JAC_O_DATA_PDTO)
 
         with self.assertRaises(AttributeError):
             hess_eq = egbm.evaluate_hessian_equality_constraints()
         hess = egbm.evaluate_hessian_outputs()
-        self.assertTrue(np.array_equal(hess.row, np.asarray([2, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(hess.col, np.asarray([1, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(hess.data, np.asarray([-156.0, -104.0], dtype=np.float64)))
+        np.testing.assert_array_equal(hess.row, np.asarray([2, 2], dtype=np.int64))
+        np.testing.assert_array_equal(hess.col, np.asarray([1, 2], dtype=np.int64))
+        np.testing.assert_array_equal(hess.data, np.asarray([-156.0, -104.0], dtype=np.float64))
 
     def test_pressure_drop_two_equalities(self):
         egbm = PressureDropTwoEqualities()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F', 'P2', 'Pout'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F', 'P2', 'Pout'))
         eq_con_names = egbm.equality_constraint_names()
-        self.assertEqual(eq_con_names, ['pdrop2', 'pdropout'])
+        self.assertEqual(eq_con_names, ('pdrop2', 'pdropout'))
         output_names = egbm.output_names()
         self.assertEqual([], output_names)
 
@@ -771,7 +1027,7 @@ class TestExternalGreyBoxModel(unittest.TestCase):
         #             [Pout - (P2 - 2*c*F^2]
         #   h_o(u) = {empty}
         eq = egbm.evaluate_equality_constraints()
-        self.assertTrue(np.array_equal(eq, np.asarray([-44, 66], dtype=np.float64)))
+        np.testing.assert_array_equal(eq, _EXP_EQ_PDTE)
 
         with self.assertRaises(NotImplementedError):
             tmp = egbm.evaluate_outputs()
@@ -780,9 +1036,8 @@ class TestExternalGreyBoxModel(unittest.TestCase):
             tmp = egbm.evaluate_jacobian_outputs()
 
         jac_eq = egbm.evaluate_jacobian_equality_constraints()
-        self.assertTrue(np.array_equal(jac_eq.row, np.asarray([0,0,0,0,1,1,1,1], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.col, np.asarray([0,1,2,3,1,2,3,4], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.data, np.asarray([-1, 18, 24, 1, 18, 24, -1, 1], dtype=np.float64)))
+        self._assert_coo_equal(jac_eq, _EXP_JAC_EQ_ROW_PDTE,
+                               _EXP_JAC_EQ_COL_PDTE, _EXP_JAC_EQ_DATA_PDTE)
 
         with self.assertRaises(AttributeError):
             hess_outputs = egbm.evaluate_hessian_outputs()
@@ -792,9 +1047,9 @@ class TestExternalGreyBoxModel(unittest.TestCase):
     def test_pressure_drop_two_equalities_with_hessian(self):
         egbm = PressureDropTwoEqualitiesWithHessian()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F', 'P2', 'Pout'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F', 'P2', 'Pout'))
         eq_con_names = egbm.equality_constraint_names()
-        self.assertEqual(eq_con_names, ['pdrop2', 'pdropout'])
+        self.assertEqual(eq_con_names, ('pdrop2', 'pdropout'))
         output_names = egbm.output_names()
         self.assertEqual([], output_names)
 
@@ -811,7 +1066,7 @@ class TestExternalGreyBoxModel(unittest.TestCase):
         #             [Pout - (P2 - 2*c*F^2]
         #   h_o(u) = {empty}
         eq = egbm.evaluate_equality_constraints()
-        self.assertTrue(np.array_equal(eq, np.asarray([-44, 66], dtype=np.float64)))
+        np.testing.assert_array_equal(eq, _EXP_EQ_PDTE)
 
         with self.assertRaises(NotImplementedError):
             tmp = egbm.evaluate_outputs()
@@ -820,16 +1075,15 @@ class TestExternalGreyBoxModel(unittest.TestCase):
             tmp = egbm.evaluate_jacobian_outputs()
 
         jac_eq = egbm.evaluate_jacobian_equality_constraints()
-        self.assertTrue(np.array_equal(jac_eq.row, np.asarray([0,0,0,0,1,1,1,1], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.col, np.asarray([0,1,2,3,1,2,3,4], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.data, np.asarray([-1, 18, 24, 1, 18, 24, -1, 1], dtype=np.float64)))
+        self._assert_coo_equal(jac_eq, _EXP_JAC_EQ_ROW_PDTE,
+                               _EXP_JAC_EQ_COL_PDTE, _EXP_JAC_EQ_DATA_PDTE)
 
         with self.assertRaises(AttributeError):
             hess_outputs = egbm.evaluate_hessian_outputs()
         hess = egbm.evaluate_hessian_equality_constraints()
-        self.assertTrue(np.array_equal(hess.row, np.asarray([2, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(hess.col, np.asarray([1, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(hess.data, np.asarray([96.0, 64.0], dtype=np.float64)))
+        np.testing.assert_array_equal(hess.row, np.asarray([2, 2], dtype=np.int64))
+        np.testing.assert_array_equal(hess.col, np.asarray([1, 2], dtype=np.int64))
+        np.testing.assert_array_equal(hess.data, np.asarray([96.0, 64.0], dtype=np.float64))
 
 
     def test_pressure_drop_two_equalities_two_outputs(self):
@@ -841,30 +1095,28 @@ class TestExternalGreyBoxModel(unittest.TestCase):
         #            [Pin - 4*c*F^2]
         egbm = PressureDropTwoEqualitiesTwoOutputs()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F', 'P1', 'P3'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F', 'P1', 'P3'))
         eq_con_names = egbm.equality_constraint_names()
-        self.assertEqual(eq_con_names, ['pdrop1', 'pdrop3'])
+        self.assertEqual(eq_con_names, ('pdrop1', 'pdrop3'))
         output_names = egbm.output_names()
-        self.assertEqual(output_names, ['P2', 'Pout'])
+        self.assertEqual(output_names, ('P2', 'Pout'))
 
         egbm.set_input_values(np.asarray([100, 2, 3, 80, 70], dtype=np.float64))
         egbm.set_equality_constraint_multipliers(np.asarray([2, 4], dtype=np.float64))
         egbm.set_output_constraint_multipliers(np.asarray([7, 9], dtype=np.float64))
         eq = egbm.evaluate_equality_constraints()
-        self.assertTrue(np.array_equal(eq, np.asarray([-2, 26], dtype=np.float64)))
+        np.testing.assert_array_equal(eq, _EXP_EQ_PDTETO)
 
         o = egbm.evaluate_outputs()
-        self.assertTrue(np.array_equal(o, np.asarray([62, 28], dtype=np.float64)))
+        np.testing.assert_array_equal(o, _EXP_O_PDTETO)
 
         jac_eq = egbm.evaluate_jacobian_equality_constraints()
-        self.assertTrue(np.array_equal(jac_eq.row, np.asarray([0,0,0,0,1,1,1,1], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.col, np.asarray([0,1,2,3,1,2,3,4], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.data, np.asarray([-1, 9, 12, 1, 18, 24, -1, 1], dtype=np.float64)))
+        self._assert_coo_equal(jac_eq, _EXP_JAC_EQ_ROW_PDTETO,
+                               _EXP_JAC_EQ_COL_PDTETO, _EXP_JAC_EQ_DATA_PDTETO)
 
         jac_o = egbm.evaluate_jacobian_outputs()
-        self.assertTrue(np.array_equal(jac_o.row, np.asarray([0,0,0,1,1,1], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.col, np.asarray([1,2,3,0,1,2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.data, np.asarray([-9, -12, 1, 1, -36, -48], dtype=np.float64)))
+        self._assert_coo_equal(jac_o, _EXP_JAC_O_ROW_PDTETO,
+                               _EXP_JAC_O_COL_PDTETO, _EXP_JAC_O_DATA_PDTETO)
 
         with self.assertRaises(AttributeError):
             hess = egbm.evaluate_hessian_equality_constraints()
@@ -880,40 +1132,86 @@ class TestExternalGreyBoxModel(unittest.TestCase):
         #            [Pin - 4*c*F^2]
         egbm = PressureDropTwoEqualitiesTwoOutputsWithHessian()
         input_names = egbm.input_names()
-        self.assertEqual(input_names, ['Pin', 'c', 'F', 'P1', 'P3'])
+        self.assertEqual(input_names, ('Pin', 'c', 'F', 'P1', 'P3'))
         eq_con_names = egbm.equality_constraint_names()
-        self.assertEqual(eq_con_names, ['pdrop1', 'pdrop3'])
+        self.assertEqual(eq_con_names, ('pdrop1', 'pdrop3'))
         output_names = egbm.output_names()
-        self.assertEqual(output_names, ['P2', 'Pout'])
+        self.assertEqual(output_names, ('P2', 'Pout'))
 
         egbm.set_input_values(np.asarray([100, 2, 3, 80, 70], dtype=np.float64))
         egbm.set_equality_constraint_multipliers(np.asarray([2, 4], dtype=np.float64))
         egbm.set_output_constraint_multipliers(np.asarray([7, 9], dtype=np.float64))
         eq = egbm.evaluate_equality_constraints()
-        self.assertTrue(np.array_equal(eq, np.asarray([-2, 26], dtype=np.float64)))
+        np.testing.assert_array_equal(eq, _EXP_EQ_PDTETO)
 
         o = egbm.evaluate_outputs()
-        self.assertTrue(np.array_equal(o, np.asarray([62, 28], dtype=np.float64)))
+        np.testing.assert_array_equal(o, _EXP_O_PDTETO)
 
         jac_eq = egbm.evaluate_jacobian_equality_constraints()
-        self.assertTrue(np.array_equal(jac_eq.row, np.asarray([0,0,0,0,1,1,1,1], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.col, np.asarray([0,1,2,3,1,2,3,4], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_eq.data, np.asarray([-1, 9, 12, 1, 18, 24, -1, 1], dtype=np.float64)))
+        self._assert_coo_equal(jac_eq, _EXP_JAC_EQ_ROW_PDTETO,
+                               _EXP_JAC_EQ_COL_PDTETO, _EXP_JAC_EQ_DATA_PDTETO)
 
         jac_o = egbm.evaluate_jacobian_outputs()
-        self.assertTrue(np.array_equal(jac_o.row, np.asarray([0,0,0,1,1,1], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.col, np.asarray([1,2,3,0,1,2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(jac_o.data, np.asarray([-9, -12, 1, 1, -36, -48], dtype=np.float64)))
+        self._assert_coo_equal(jac_o, _EXP_JAC_O_ROW_PDTETO,
+                               _EXP_JAC_O_COL_PDTETO, _EXP_JAC_O_DATA_PDTETO)
 
         hess = egbm.evaluate_hessian_equality_constraints()
-        self.assertTrue(np.array_equal(hess.row, np.asarray([2, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(hess.col, np.asarray([1, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(hess.data, np.asarray([60.0, 40.0], dtype=np.float64)))
+        np.testing.assert_array_equal(hess.row, np.asarray([2, 2], dtype=np.int64))
+        np.testing.assert_array_equal(hess.col, np.asarray([1, 2], dtype=np.int64))
+        np.testing.assert_array_equal(hess.data, np.asarray([60.0, 40.0], dtype=np.float64))
 
         hess = egbm.evaluate_hessian_outputs()
-        self.assertTrue(np.array_equal(hess.row, np.asarray([2, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(hess.col, np.asarray([1, 2], dtype=np.int64)))
-        self.assertTrue(np.array_equal(hess.data, np.asarray([-258, -172], dtype=np.float64)))
+        np.testing.assert_array_equal(hess.row, np.asarray([2, 2], dtype=np.int64))
+        np.testing.assert_array_equal(hess.col, np.asarray([1, 2], dtype=np.int64))
+        np.testing.assert_array_equal(hess.data, np.asarray([-258, -172], dtype=np.float64))
+
+    def test_shared_sparsity_structure(self):
+        # the module-level index arrays are shared by all instances of a
+        # model, so they must not be writable (whether scipy keeps a
+        # reference to them or makes its own copy is up to scipy)
+        for idx in (_IROW_PDTO, _JCOL_PDTO, _IROW_HESS, _JCOL_HESS):
+            self.assertFalse(idx.flags.writeable)
+            with self.assertRaises(ValueError):
+                idx[0] = 1
+        egbm = PressureDropTwoOutputsWithHessian()
+        egbm.set_input_values(np.asarray([100, 2, 3], dtype=np.float64))
+        egbm.set_output_constraint_multipliers(np.asarray([3.0, 5.0], dtype=np.float64))
+        jac_o = egbm.evaluate_jacobian_outputs()
+        self.assertTrue(np.array_equal(jac_o.row, _IROW_PDTO))
+        self.assertTrue(np.array_equal(jac_o.col, _JCOL_PDTO))
+        hess = egbm.evaluate_hessian_outputs()
+        self.assertTrue(np.array_equal(hess.row, _IROW_HESS))
+        self.assertTrue(np.array_equal(hess.col, _JCOL_HESS))
+
+    def test_evaluate_batch(self):
+        # the vectorized evaluations should match a loop over
+        # set_input_values and the evaluate methods
+        models = [PressureDropSingleOutput(), PressureDropSingleEquality(),
+                  PressureDropTwoOutputs(), PressureDropTwoEqualities(),
+                  PressureDropTwoEqualitiesTwoOutputs()]
+        for egbm in models:
+            X = np.asarray([[100, 2, 3, 80, 70],
+                            [100, 1, 2, 50, 20],
+                            [60, 0.5, 4, 40, 30]], dtype=np.float64)
+            X = X[:, :egbm.n_inputs()]
+            if egbm.n_equality_constraints() > 0:
+                eq, jac_data = egbm.evaluate_batch_equality_constraints(X)
+                self.assertEqual(eq.shape, (3, egbm.n_equality_constraints()))
+                for i in range(3):
+                    egbm.set_input_values(X[i])
+                    np.testing.assert_allclose(
+                        eq[i], egbm.evaluate_equality_constraints())
+                    np.testing.assert_allclose(
+                        jac_data[i],
+                        egbm.evaluate_jacobian_equality_constraints().data)
+            if egbm.n_outputs() > 0:
+                o, jac_data = egbm.evaluate_batch_outputs(X)
+                self.assertEqual(o.shape, (3, egbm.n_outputs()))
+                for i in range(3):
+                    egbm.set_input_values(X[i])
+                    np.testing.assert_allclose(o[i], egbm.evaluate_outputs())
+                    np.testing.assert_allclose(
+                        jac_data[i], egbm.evaluate_jacobian_outputs().data)
 """
     def test_pressure_drop_two_equalities_two_outputs_no_hessian(self):
         #   u = [Pin, c, F, P1, P3]
@@ -1438,6 +1736,7 @@ class TestPyomoGreyBoxNLP(unittest.TestCase):
     def test_pressure_drop_two_equalities_two_outputs(self):
         self._test_pressure_drop_two_equalities_two_outputs(PressureDropTwoEqualitiesTwoOutputs(), False)
         self._test_pressure_drop_two_equalities_two_outputs(PressureDropTwoEqualitiesTwoOutputsWithHessian(), True)
+        self._test_pressure_drop_two_equalities_two_outputs(PressureDropTwoEqualitiesTwoOutputsCSR(), False)
 
     def _test_pressure_drop_two_equalities_two_outputs(self, ex_model, hessian_support):
         m = pyo.ConcreteModel()
@@ -1567,6 +1866,86 @@ class TestPyomoGreyBoxNLP(unittest.TestCase):
             with self.assertRaises(AttributeError):
                 h = pyomo_nlp.evaluate_hessian_lag()
 
+    def _create_pressure_drop_two_equalities_two_outputs_model(self, ex_model):
+        m = pyo.ConcreteModel()
+        m.egb = ExternalGreyBoxBlock()
+        m.egb.set_external_model(ex_model)
+        m.egb.inputs['Pin'].value = 100
+        m.egb.inputs['c'].value = 2
+        m.egb.inputs['F'].value = 3
+        m.egb.inputs['P1'].value = 80
+        m.egb.inputs['P3'].value = 70
+        m.egb.outputs['P2'].value = 75
+        m.egb.outputs['Pout'].value = 50
+        m.obj = pyo.Objective(expr=(m.egb.outputs['Pout']-20)**2)
+        return m
+
+    def test_jacobian_updated_values(self):
+        self._test_jacobian_updated_values(PressureDropTwoEqualitiesTwoOutputs())
+        self._test_jacobian_updated_values(PressureDropTwoEqualitiesTwoOutputsCSR())
+
+    def _test_jacobian_updated_values(self, ex_model):
+        # the jacobian structure is built on the first evaluation and
+        # only the values are updated afterwards, so check that a
+        # second evaluation at a different point gives the new values
+        m = self._create_pressure_drop_two_equalities_two_outputs_model(ex_model)
+        pyomo_nlp = PyomoGreyBoxNLP(m)
+        comparison_x_order = ['egb.inputs[Pin]', 'egb.inputs[c]', 'egb.inputs[F]',
+                              'egb.inputs[P1]', 'egb.inputs[P3]',
+                              'egb.outputs[P2]', 'egb.outputs[Pout]']
+        x_order = pyomo_nlp.variable_names()
+        comparison_c_order = ['egb.pdrop1', 'egb.pdrop3', 'egb.P2_con', 'egb.Pout_con']
+        c_order = pyomo_nlp.constraint_names()
+
+        j = pyomo_nlp.evaluate_jacobian()
+        comparison_j = np.asarray([[-1,   9,  12,  1, 0,  0,  0],
+                                   [ 0,  18,  24, -1, 1,  0,  0],
+                                   [ 0,  -9, -12,  1, 0, -1,  0],
+                                   [ 1, -36, -48,  0, 0,  0, -1]])
+        check_sparse_matrix_specific_order(self, j, c_order, x_order, comparison_j, comparison_c_order, comparison_x_order)
+
+        x = pyomo_nlp.get_primals()
+        x[x_order.index('egb.inputs[c]')] = 3
+        x[x_order.index('egb.inputs[F]')] = 2
+        pyomo_nlp.set_primals(x)
+        j = pyomo_nlp.evaluate_jacobian()
+        comparison_j = np.asarray([[-1,   4,  12,  1, 0,  0,  0],
+                                   [ 0,   8,  24, -1, 1,  0,  0],
+                                   [ 0,  -4, -12,  1, 0, -1,  0],
+                                   [ 1, -16, -48,  0, 0,  0, -1]])
+        check_sparse_matrix_specific_order(self, j, c_order, x_order, comparison_j, comparison_c_order, comparison_x_order)
+
+    def test_error_residuals_wrong_length(self):
+        ex_model = PressureDropTwoEqualitiesTwoOutputsInconsistent()
+        m = self._create_pressure_drop_two_equalities_two_outputs_model(ex_model)
+        pyomo_nlp = PyomoGreyBoxNLP(m)
+
+        ex_model.drop = 'equality_constraints'
+        pyomo_nlp.set_primals(pyomo_nlp.get_primals())
+        with self.assertRaisesRegex(ValueError, 'returned 1 equality constraint residuals, but it has 2'):
+            pyomo_nlp.evaluate_constraints()
+
+        ex_model.drop = 'outputs'
+        pyomo_nlp.set_primals(pyomo_nlp.get_primals())
+        with self.assertRaisesRegex(ValueError, 'returned 1 output values, but it has 2'):
+            pyomo_nlp.evaluate_constraints()
+
+    def test_error_jacobian_nnz_changed(self):
+        ex_model = PressureDropTwoEqualitiesTwoOutputsInconsistent()
+        m = self._create_pressure_drop_two_equalities_two_outputs_model(ex_model)
+        # the jacobian is first evaluated when the nlp is created
+        pyomo_nlp = PyomoGreyBoxNLP(m)
+
+        ex_model.drop = 'jacobian_equality_constraints'
+        pyomo_nlp.set_primals(pyomo_nlp.get_primals())
+        with self.assertRaisesRegex(ValueError, 'jacobian of the equality constraints .* changed from 8 to 7'):
+            pyomo_nlp.evaluate_jacobian()
+
+        ex_model.drop = 'jacobian_outputs'
+        pyomo_nlp.set_primals(pyomo_nlp.get_primals())
+        with self.assertRaisesRegex(ValueError, 'jacobian of the outputs .* changed from 6 to 5'):
+            pyomo_nlp.evaluate_jacobian()
+
     def test_external_additional_constraints_vars(self):
         self._test_external_additional_constraints_vars(PressureDropTwoEqualitiesTwoOutputs(), False)
         self._test_external_additional_constraints_vars(PressureDropTwoEqualitiesTwoOutputsWithHessian(), True)